@@ -1,10 +1,20 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from typing import Dict, Tuple, List
 from geopy.distance import geodesic
-import random
+import numpy as np
+from numba import njit
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 
-app = FastAPI()
+# PCG64 jauh lebih cepat dari random.* per panggilan, apalagi draw batch
+rng = np.random.default_rng()
 
 # Lokasi tetap
 STATIC_LOCATIONS = {
@@ -18,6 +28,21 @@ GENERATIONS = 300
 CROSSOVER_RATE = 0.85
 MUTATION_RATE = 0.05
 ELITISM_COUNT = 2
+# Jumlah island (subpopulasi independen) yang jalan paralel per request
+ISLAND_COUNT = min(4, os.cpu_count() or 1)
+# Berhenti lebih awal kalau best distance stagnan sekian generasi
+PATIENCE = 30
+
+# Cache distance matrix antar request (operator sering replay set TPS yang sama);
+# 128 entri x (100x100) float64 kira-kira 10 MB di kasus terburuk
+MATRIX_CACHE_SIZE = 128
+MATRIX_CACHE = OrderedDict()
+_matrix_cache_lock = threading.Lock()
+
+# Radius bumi (km) untuk rumus haversine
+EARTH_RADIUS_KM = 6371.0088
+# Set True kalau butuh presisi geodesic penuh (jauh lebih lambat)
+USE_GEODESIC = False
 
 # --- Data Model ---
 class TPSItem(BaseModel):
@@ -32,20 +57,153 @@ class TPSRequest(BaseModel):
 def calculate_distance(coord1, coord2):
     return geodesic(coord1, coord2).km
 
-def calculate_route_metrics(route_points, locations_dict):
-    total_distance = 0
-    total_duration = 0
-    route_segments = []
+def create_distance_matrix(coords_list):
+    if USE_GEODESIC:
+        n = len(coords_list)
+        matrix = np.empty((n, n), dtype=np.float32)
+        for i in range(n):
+            matrix[i, i] = 0.0
+            for j in range(i + 1, n):
+                dist = calculate_distance(coords_list[i], coords_list[j])
+                matrix[i, j] = matrix[j, i] = dist
+        return matrix
+    return build_distance_matrix(coords_list)
+
+def build_distance_matrix(coords_list):
+    # Haversine tervektorisasi: seluruh matrix (N,N) dihitung sekali di NumPy.
+    # float32 cukup (presisi ~1 m di skala kota) dan separuh lebih hemat memori
+    coords = np.radians(np.asarray(coords_list, dtype=np.float32))
+    lat = coords[:, 0]
+    lon = coords[:, 1]
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:, None]) * np.cos(lat[None, :]) * np.sin(dlon / 2) ** 2
+    # Clip untuk jaga-jaga pembulatan float di titik hampir antipodal
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+# --- Kernel Numba (nopython) untuk hot path GA ---
+@njit(nogil=True, cache=True)
+def _two_opt(route, D):
+    # Local search deterministik di atas matrix: balik segmen selama masih
+    # ada perbaikan; delta per move O(1) lewat 4 sisi yang berubah
+    n = D.shape[0]
+    num = route.shape[0]
+    improved = True
+    while improved:
+        improved = False
+        for i in range(num - 1):
+            a = 0 if i == 0 else route[i - 1]
+            b = route[i]
+            for j in range(i + 1, num):
+                c = route[j]
+                d = n - 1 if j == num - 1 else route[j + 1]
+                if D[a, c] + D[b, d] < D[a, b] + D[c, d] - 1e-7:
+                    lo = i
+                    hi = j
+                    while lo < hi:
+                        tmp = route[lo]
+                        route[lo] = route[hi]
+                        route[hi] = tmp
+                        lo += 1
+                        hi -= 1
+                    improved = True
+                    b = route[i]
+
+@njit(nogil=True, cache=True)
+def _run_island(D, num_tps, seed, pop_size, generations, crossover_rate, mutation_rate, elitism, patience):
+    # Satu island GA lengkap dalam nopython mode; nogil=True supaya
+    # beberapa island bisa jalan paralel di thread terpisah.
+    # State RNG numba bersifat per-thread, jadi seed per island aman.
+    np.random.seed(seed)
+    n = D.shape[0]
+
+    base = np.arange(1, num_tps + 1).astype(np.int32)
+    pop = np.empty((pop_size, num_tps), dtype=np.int32)
+    for p in range(pop_size):
+        pop[p] = np.random.permutation(base)
+    next_pop = np.empty_like(pop)
+    seen = np.zeros(n, dtype=np.uint8)
+    dists = np.empty(pop_size, dtype=np.float64)
+
+    best_route = np.empty(num_tps, dtype=np.int32)
+    best_distance = np.inf
+    stagnant = 0
+
+    for _ in range(generations):
+        improved_this_gen = False
+        for p in range(pop_size):
+            s = D[0, pop[p, 0]] + D[pop[p, num_tps - 1], n - 1]
+            for k in range(num_tps - 1):
+                s += D[pop[p, k], pop[p, k + 1]]
+            dists[p] = s
+            if s < best_distance:
+                best_distance = s
+                best_route[:] = pop[p]
+                improved_this_gen = True
+
+        if improved_this_gen:
+            stagnant = 0
+        else:
+            stagnant += 1
+            if stagnant >= patience:
+                break
 
-    for i in range(len(route_points) - 1):
-        from_point = route_points[i]
-        to_point = route_points[i + 1]
-        base_distance = calculate_distance(locations_dict[from_point], locations_dict[to_point])
+        order = np.argsort(dists)
+        for e in range(elitism):
+            next_pop[e] = pop[order[e]]
+
+        for c in range(elitism, pop_size):
+            p1 = np.random.randint(0, pop_size)
+            p2 = np.random.randint(0, pop_size)
+
+            if num_tps > 1 and np.random.random() < crossover_rate:
+                # Order crossover: prefix p1, sisanya urutan p2, O(N) pakai mask
+                cut = 1 + np.random.randint(0, num_tps - 1)
+                seen[:] = 0
+                for k in range(cut):
+                    v = pop[p1, k]
+                    next_pop[c, k] = v
+                    seen[v] = 1
+                w = cut
+                for k in range(num_tps):
+                    g = pop[p2, k]
+                    if seen[g] == 0:
+                        next_pop[c, w] = g
+                        w += 1
+            else:
+                next_pop[c] = pop[p1]
+
+            if num_tps > 1 and np.random.random() < mutation_rate:
+                i = np.random.randint(0, num_tps)
+                j = np.random.randint(0, num_tps)
+                while j == i:
+                    j = np.random.randint(0, num_tps)
+                tmp = next_pop[c, i]
+                next_pop[c, i] = next_pop[c, j]
+                next_pop[c, j] = tmp
+
+        swap = pop
+        pop = next_pop
+        next_pop = swap
+
+    return best_route, best_distance
+
+def route_segments(full_route, route_points, distance_matrix):
+    # Pelaporan (dict per segment + pembulatan) hanya untuk rute terbaik,
+    # terpisah dari scoring yang murni penjumlahan matrix
+    total_distance = 0.0
+    total_duration = 0.0
+    segments = []
+
+    for k in range(len(full_route) - 1):
+        a = full_route[k]
+        b = full_route[k + 1]
+        base_distance = float(distance_matrix[a, b])
         duration = base_distance * 2  # Asumsi 30 km/h
 
-        route_segments.append({
-            "from": from_point,
-            "to": to_point,
+        segments.append({
+            "from": route_points[a],
+            "to": route_points[b],
             "distance_km": round(base_distance, 1),
             "estimated_time_minutes": round(duration, 1)
         })
@@ -53,7 +211,7 @@ def calculate_route_metrics(route_points, locations_dict):
         total_distance += base_distance
         total_duration += duration
 
-    return route_segments, round(total_distance, 1), round(total_duration, 1)
+    return segments, round(total_distance, 1), round(total_duration, 1)
 
 def genetic_algorithm(tps_dict):
     if not tps_dict:
@@ -61,53 +219,76 @@ def genetic_algorithm(tps_dict):
 
     locations_dict = {**STATIC_LOCATIONS, **tps_dict}
     tps_names = list(tps_dict.keys())
-    route_points = ["DEPO"] + tps_names + ["TPA_SARIMUKTI"]
-
-    population = [random.sample(range(1, len(tps_names) + 1), len(tps_names)) for _ in range(POPULATION_SIZE)]
-    best_route = None
-    best_distance = float('inf')
-    best_segments = []
-    best_duration = 0
-
-    for _ in range(GENERATIONS):
-        fitness_scores = []
-        for route in population:
-            full_route = [0] + route + [len(route_points) - 1]
-            named_route = [route_points[i] for i in full_route]
-            segments, dist, dur = calculate_route_metrics(named_route, locations_dict)
-            fitness_scores.append(1.0 / dist if dist > 0 else float('inf'))
 
-            if dist < best_distance:
-                best_route = route
-                best_distance = dist
-                best_segments = segments
-                best_duration = dur
+    # Ambil matrix dari cache kalau set TPS (nama+koordinat) persis sama
+    cache_key = hashlib.blake2b(repr(sorted(tps_dict.items())).encode(), digest_size=16).digest()
+    with _matrix_cache_lock:
+        cached = MATRIX_CACHE.get(cache_key)
+        if cached is not None:
+            MATRIX_CACHE.move_to_end(cache_key)
 
-        elite_indices = sorted(range(len(fitness_scores)), key=lambda i: fitness_scores[i], reverse=True)[:ELITISM_COUNT]
-        next_gen = [population[i][:] for i in elite_indices]
+    if cached is not None:
+        route_points, distance_matrix = cached
+    else:
+        route_points = ["DEPO"] + tps_names + ["TPA_SARIMUKTI"]
+        # Koordinat sebagai satu array float32 kontigu (SoA), diindeks id node
+        coords = np.empty((len(route_points), 2), dtype=np.float32)
+        for i, name in enumerate(route_points):
+            coords[i] = locations_dict[name]
+        distance_matrix = create_distance_matrix(coords)
+        with _matrix_cache_lock:
+            MATRIX_CACHE[cache_key] = (route_points, distance_matrix)
+            if len(MATRIX_CACHE) > MATRIX_CACHE_SIZE:
+                MATRIX_CACHE.popitem(last=False)
 
-        while len(next_gen) < POPULATION_SIZE:
-            parent1 = population[random.randint(0, POPULATION_SIZE - 1)][:]
-            parent2 = population[random.randint(0, POPULATION_SIZE - 1)][:]
-            child = parent1[:]
+    n = len(route_points)
+    num_tps = len(tps_names)
 
-            if random.random() < CROSSOVER_RATE:
-                cut = random.randint(1, len(parent1) - 1)
-                child = parent1[:cut] + [g for g in parent2 if g not in parent1[:cut]]
+    # K island independen, masing-masing kernel nopython yang melepas GIL,
+    # jadi ThreadPoolExecutor memberi skala hampir linier antar core
+    seeds = [int(s) for s in rng.integers(0, 2**31 - 1, size=ISLAND_COUNT)]
+    if ISLAND_COUNT > 1:
+        with ThreadPoolExecutor(max_workers=ISLAND_COUNT) as executor:
+            futures = [
+                executor.submit(
+                    _run_island, distance_matrix, num_tps, seed,
+                    POPULATION_SIZE, GENERATIONS, CROSSOVER_RATE, MUTATION_RATE, ELITISM_COUNT, PATIENCE,
+                )
+                for seed in seeds
+            ]
+            results = [f.result() for f in futures]
+    else:
+        results = [_run_island(distance_matrix, num_tps, seeds[0],
+                               POPULATION_SIZE, GENERATIONS, CROSSOVER_RATE, MUTATION_RATE, ELITISM_COUNT, PATIENCE)]
 
-            if random.random() < MUTATION_RATE:
-                i, j = random.sample(range(len(child)), 2)
-                child[i], child[j] = child[j], child[i]
+    best_route, best_distance = min(results, key=lambda r: r[1])
+    # Poles hasil GA dengan 2-opt sampai optimum lokal
+    _two_opt(best_route, distance_matrix)
 
-            next_gen.append(child)
+    # Rekonstruksi segments sekali saja untuk rute terbaik
+    full_route = [0] + list(best_route) + [n - 1]
+    return route_segments(full_route, route_points, distance_matrix)
 
-        population = next_gen
+# --- App ---
+@asynccontextmanager
+async def lifespan(app):
+    # Pre-compile kernel numba di startup (dari cache kalau ada), supaya
+    # request pertama tidak membayar kompilasi JIT
+    warm_coords = np.array([(-6.9, 107.6), (-6.91, 107.61), (-6.92, 107.62)], dtype=np.float32)
+    warm_matrix = build_distance_matrix(warm_coords)
+    warm_route, _ = _run_island(warm_matrix, 1, 0, 4, 1,
+                                CROSSOVER_RATE, MUTATION_RATE, 1, 1)
+    _two_opt(warm_route, warm_matrix)
+    yield
 
-    return best_segments, best_distance, best_duration
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+app.add_middleware(GZipMiddleware, minimum_size=512)
 
 # --- Endpoint ---
 @app.post("/optimize")
-async def optimize_route(data: TPSRequest):
+def optimize_route(data: TPSRequest):
+    # Endpoint sinkron: GA itu CPU-bound, biarkan FastAPI menjalankannya
+    # di threadpool supaya event loop tidak terblokir
     if not data.tps:
         raise HTTPException(status_code=400, detail="TPS list kosong.")
 
@@ -1,6 +1,10 @@
-import random
+import numpy as np
+from numba import njit, prange
 from geopy.distance import geodesic
 
+# PCG64 dengan draw batch per generasi, jauh lebih murah dari random.* per call
+rng = np.random.default_rng()
+
 # Lokasi tetap
 STATIC_LOCATIONS = {
     "DEPO": (-6.94898612340884, 107.6878271549783),
@@ -13,27 +17,164 @@ GENERATIONS = 300
 CROSSOVER_RATE = 0.85
 MUTATION_RATE = 0.05
 ELITISM_COUNT = 2
+TOURNAMENT_SIZE = 5
+# Berhenti lebih awal kalau best distance stagnan sekian generasi
+PATIENCE = 40
+
+# Radius bumi (km) untuk rumus haversine
+EARTH_RADIUS_KM = 6371.0088
 
 def calculate_distance(coord1, coord2):
     return geodesic(coord1, coord2).km
 
 def create_distance_matrix(coords_list):
-    matrix = [[0.0] * len(coords_list) for _ in range(len(coords_list))]
-    for i in range(len(coords_list)):
-        for j in range(i + 1, len(coords_list)):
-            dist = calculate_distance(coords_list[i], coords_list[j])
-            matrix[i][j] = matrix[j][i] = dist
-    return matrix
-
-def calculate_route_metrics(route_points, locations_dict, consider_traffic=False, traffic_conditions=None):
+    # Haversine tervektorisasi: seluruh matrix (N,N) sekali jalan di NumPy,
+    # menggantikan loop ganda geodesic (akurat <0.5% untuk skala kota).
+    # float32 (presisi ~1 m) menjaga matrix tetap muat di cache
+    coords = np.radians(np.asarray(coords_list, dtype=np.float32))
+    lat = coords[:, 0]
+    lon = coords[:, 1]
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:, None]) * np.cos(lat[None, :]) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+# --- Kernel Numba (nopython) untuk hot path GA ---
+@njit(cache=True, fastmath=True)
+def route_length(perm, D, n):
+    s = D[0, perm[0]] + D[perm[-1], n - 1]
+    for k in range(perm.shape[0] - 1):
+        s += D[perm[k], perm[k + 1]]
+    return s
+
+@njit(parallel=True, cache=True, fastmath=True)
+def run_generation(population, next_gen, dists_out, cost_matrix, n, elitism,
+                   crossover_rate, mutation_rate,
+                   winners, cx_draw, cut_points, mut_draw, opt_pairs, scratch_used):
+    # Satu generasi penuh: crossover + mutasi 2-opt + skor, prange per anak.
+    # Seluruh keacakan sudah ditarik di luar (numba random tidak aman di
+    # dalam prange); scratch_used memberi tiap anak mask-nya sendiri.
+    num_tps = population.shape[1]
+    for c in prange(winners.shape[0]):
+        out = next_gen[elitism + c]
+        parent1 = population[winners[c, 0]]
+        parent2 = population[winners[c, 1]]
+
+        if cx_draw[c] < crossover_rate:
+            # Order crossover O(N): prefix parent1, sisanya urutan parent2,
+            # keanggotaan dicek lewat mask byte
+            used = scratch_used[c]
+            used[:] = 0
+            cut = cut_points[c]
+            for k in range(cut):
+                v = parent1[k]
+                out[k] = v
+                used[v] = 1
+            w = cut
+            for k in range(num_tps):
+                g = parent2[k]
+                if used[g] == 0:
+                    out[w] = g
+                    w += 1
+        else:
+            out[:] = parent1
+
+        if mut_draw[c] < mutation_rate:
+            # Mutasi memetic: move 2-opt yang diterima hanya kalau memperbaiki
+            for t in range(opt_pairs.shape[1]):
+                i = opt_pairs[c, t, 0]
+                j = opt_pairs[c, t, 1]
+                if i > j:
+                    swap_ij = i
+                    i = j
+                    j = swap_ij
+                if i == j:
+                    continue
+                a = 0 if i == 0 else out[i - 1]
+                b = out[i]
+                cc = out[j]
+                d = n - 1 if j == num_tps - 1 else out[j + 1]
+                if cost_matrix[a, cc] + cost_matrix[b, d] < cost_matrix[a, b] + cost_matrix[cc, d] - 1e-10:
+                    lo = i
+                    hi = j
+                    while lo < hi:
+                        tmp = out[lo]
+                        out[lo] = out[hi]
+                        out[hi] = tmp
+                        lo += 1
+                        hi -= 1
+
+        dists_out[elitism + c] = route_length(out, cost_matrix, n)
+
+@njit(cache=True)
+def held_karp(D):
+    # DP bitmask eksak: dp[mask, j] = biaya minimum mulai dari DEPO,
+    # mengunjungi TPS di mask, berakhir di TPS j (node j+1)
+    n = D.shape[0]
+    m = n - 2
+    full = 1 << m
+    dp = np.full((full, m), np.inf)
+    parent = np.full((full, m), -1, dtype=np.int32)
+    for j in range(m):
+        dp[1 << j, j] = D[0, j + 1]
+
+    for mask in range(full):
+        for j in range(m):
+            if not (mask >> j) & 1 or dp[mask, j] == np.inf:
+                continue
+            base = dp[mask, j]
+            for k in range(m):
+                if (mask >> k) & 1:
+                    continue
+                new_mask = mask | (1 << k)
+                cand = base + D[j + 1, k + 1]
+                if cand < dp[new_mask, k]:
+                    dp[new_mask, k] = cand
+                    parent[new_mask, k] = j
+
+    # Tutup tour ke TPA (node n-1) dan rekonstruksi lewat parent
+    best = np.inf
+    best_j = 0
+    for j in range(m):
+        cand = dp[full - 1, j] + D[j + 1, n - 1]
+        if cand < best:
+            best = cand
+            best_j = j
+
+    route = np.empty(m, dtype=np.int32)
+    mask = full - 1
+    j = best_j
+    for idx in range(m - 1, -1, -1):
+        route[idx] = j + 1
+        prev = parent[mask, j]
+        mask ^= 1 << j
+        j = prev
+    return route, best
+
+def nn_tour(cost_matrix, start, num_tps):
+    # Tour nearest-neighbor serakah di atas matrix (node TPS = 1..num_tps)
+    tour = np.empty(num_tps, dtype=np.int16)
+    visited = np.zeros(num_tps + 1, dtype=bool)
+    tour[0] = start
+    visited[start] = True
+    current = start
+    for k in range(1, num_tps):
+        row = np.array(cost_matrix[current, 1:num_tps + 1])
+        row[visited[1:]] = np.inf
+        current = int(np.argmin(row)) + 1
+        tour[k] = current
+        visited[current] = True
+    return tour
+
+def calculate_route_metrics(full_route, route_points, distance_matrix, consider_traffic=False, traffic_conditions=None):
     total_distance = 0
     total_duration = 0
     route_segments = []
 
-    for i in range(len(route_points) - 1):
-        from_point = route_points[i]
-        to_point = route_points[i + 1]
-        base_distance = calculate_distance(locations_dict[from_point], locations_dict[to_point])
+    for k in range(len(full_route) - 1):
+        from_point = route_points[full_route[k]]
+        to_point = route_points[full_route[k + 1]]
+        base_distance = float(distance_matrix[full_route[k]][full_route[k + 1]])
         segment_duration = base_distance * 2  # asumsi 30 km/h
         traffic_level = "Light"
 
@@ -74,51 +215,107 @@ def genetic_algorithm(tps_data, consider_traffic=False, traffic_conditions=None)
     coords = [locations_dict[name] for name in route_points]
     distance_matrix = create_distance_matrix(coords)
 
-    # Inisialisasi populasi
-    population = [random.sample(range(1, len(tps_names) + 1), len(tps_names)) for _ in range(POPULATION_SIZE)]
-    
+    # Faktor traffic dilipat ke satu matrix biaya efektif sekali di awal,
+    # sehingga GA menghindari segmen macet tanpa format-string/dict lookup
+    # per segmen di hot path
+    if consider_traffic and traffic_conditions:
+        traffic_factors = np.ones_like(distance_matrix)
+        for i, from_point in enumerate(route_points):
+            for j, to_point in enumerate(route_points):
+                level = traffic_conditions.get(f"{from_point}-{to_point}")
+                if level == "Moderate":
+                    traffic_factors[i, j] = 1.2
+                elif level == "Heavy":
+                    traffic_factors[i, j] = 1.5
+        cost_matrix = distance_matrix * traffic_factors
+    else:
+        cost_matrix = distance_matrix
+
+    num_tps = len(tps_names)
+    n_nodes = len(route_points)
+
+    # N kecil (praktisnya semua input nyata) diselesaikan eksak dengan
+    # Held-Karp dalam hitungan milidetik; GA tinggal fallback untuk N besar
+    if num_tps <= 15:
+        best_route, _ = held_karp(cost_matrix)
+        best_full_route = [0] + list(best_route) + [n_nodes - 1]
+        return calculate_route_metrics(best_full_route, route_points, distance_matrix,
+                                       consider_traffic, traffic_conditions)
+
+    # Populasi sebagai satu array 2D int32; buffer generasi berikutnya
+    # dialokasikan sekali lalu ping-pong tiap generasi. Separuh pertama
+    # di-seed tour nearest-neighbor dari tiap start TPS, sisanya acak
+    num_seeded = min(num_tps, POPULATION_SIZE // 2)
+    seeded = np.stack([nn_tour(cost_matrix, start, num_tps) for start in range(1, num_seeded + 1)])
+    randoms = rng.permuted(
+        np.tile(np.arange(1, num_tps + 1, dtype=np.int16), (POPULATION_SIZE - num_seeded, 1)), axis=1
+    )
+    # Rute cukup int16 (N <= 32k jauh di atas kebutuhan); populasi separuh
+    # lebih kecil berarti lebih banyak generasi muat di cache
+    population = np.concatenate((seeded, randoms)).astype(np.int16)
+    next_gen = np.empty_like(population)
+
     best_route = None
     best_distance = float('inf')
-    best_duration = 0
-    best_segments = []
+    stagnant = 0
+    n_children = POPULATION_SIZE - ELITISM_COUNT
+    # Mask per anak supaya prange bebas alokasi dan bebas false sharing
+    scratch_used = np.zeros((n_children, n_nodes), dtype=np.uint8)
+
+    # Skor awal populasi dalam satu gather + sum
+    full = np.empty((POPULATION_SIZE, num_tps + 2), dtype=np.int16)
+    full[:, 0] = 0
+    full[:, -1] = n_nodes - 1
+    full[:, 1:-1] = population
+    dists = cost_matrix[full[:, :-1], full[:, 1:]].sum(axis=1)
+    dists_next = np.empty_like(dists)
 
     for generation in range(GENERATIONS):
-        fitness_scores = []
-        for route in population:
-            full_route = [0] + route + [len(route_points) - 1]
-            named_route = [route_points[i] for i in full_route]
-            segments, dist, dur = calculate_route_metrics(named_route, locations_dict, consider_traffic, traffic_conditions)
-            fitness_scores.append(1.0 / dist if dist > 0 else float('inf'))
-
-            if dist < best_distance:
-                best_route = route
-                best_distance = dist
-                best_duration = dur
-                best_segments = segments
-
-        # Elitism
-        elite_indices = sorted(range(len(fitness_scores)), key=lambda i: fitness_scores[i], reverse=True)[:ELITISM_COUNT]
-        next_gen = [population[i][:] for i in elite_indices]
-
-        # Crossover & Mutation
-        while len(next_gen) < POPULATION_SIZE:
-            parent1 = population[random.randint(0, POPULATION_SIZE - 1)][:]
-            parent2 = population[random.randint(0, POPULATION_SIZE - 1)][:]
-            child = parent1[:]
-
-            if random.random() < CROSSOVER_RATE:
-                cross_point = random.randint(1, len(parent1) - 1)
-                child = parent1[:cross_point] + [gene for gene in parent2 if gene not in parent1[:cross_point]]
-
-            if random.random() < MUTATION_RATE:
-                i, j = random.sample(range(len(child)), 2)
-                child[i], child[j] = child[j], child[i]
-
-            next_gen.append(child)
-
-        population = next_gen
-
-    return best_segments, best_distance, best_duration
+        improved = False
+        gen_best = int(dists.argmin())
+        if dists[gen_best] < best_distance:
+            best_route = population[gen_best].copy()
+            best_distance = float(dists[gen_best])
+            improved = True
+
+        if improved:
+            stagnant = 0
+        else:
+            stagnant += 1
+            if stagnant >= PATIENCE:
+                break
+
+        # Elitism: top-k O(P) tanpa sort penuh; skornya ikut dibawa
+        elite_idx = np.argpartition(dists, ELITISM_COUNT)[:ELITISM_COUNT]
+        next_gen[:ELITISM_COUNT] = population[elite_idx]
+        dists_next[:ELITISM_COUNT] = dists[elite_idx]
+
+        # Seluruh keacakan generasi ini ditarik sekali dalam bentuk array:
+        # kandidat tournament, coin flip, titik potong dan pasangan 2-opt
+        cand = rng.integers(0, POPULATION_SIZE, size=(n_children, 2, TOURNAMENT_SIZE))
+        winners = cand[np.arange(n_children)[:, None], np.arange(2)[None, :],
+                       dists[cand].argmin(axis=2)]
+        cx_draw = rng.random(n_children)
+        mut_draw = rng.random(n_children)
+        cut_points = rng.integers(1, num_tps, size=n_children)
+        opt_pairs = rng.integers(0, num_tps, size=(n_children, num_tps, 2))
+
+        # Satu generasi penuh (breeding + skor) dalam kernel paralel
+        run_generation(population, next_gen, dists_next, cost_matrix, n_nodes,
+                       ELITISM_COUNT, CROSSOVER_RATE, MUTATION_RATE,
+                       winners, cx_draw, cut_points, mut_draw, opt_pairs, scratch_used)
+
+        population, next_gen = next_gen, population
+        dists, dists_next = dists_next, dists
+
+    # Generasi terakhir belum sempat dicek best-nya
+    gen_best = int(dists.argmin())
+    if dists[gen_best] < best_distance:
+        best_route = population[gen_best].copy()
+
+    # Materialisasi segments (nama, traffic, pembulatan) sekali untuk rute terbaik
+    best_full_route = [0] + list(best_route) + [len(route_points) - 1]
+    return calculate_route_metrics(best_full_route, route_points, distance_matrix, consider_traffic, traffic_conditions)
 
 # --- Contoh Penggunaan ---
 if __name__ == "__main__":